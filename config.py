@@ -20,9 +20,17 @@ CACHE_DIR.mkdir(exist_ok=True)
 # NYC Geoclient API (get from NYC Developer Portal)
 GEOCLIENT_APP_ID = os.getenv("GEOCLIENT_APP_ID", "")
 GEOCLIENT_APP_KEY = os.getenv("GEOCLIENT_APP_KEY", "")
+GEOCODE_MAX_WORKERS = int(os.getenv("GEOCODE_MAX_WORKERS", 16))
+GEOCODE_CACHE_SIZE = int(os.getenv("GEOCODE_CACHE_SIZE", 10000))
 
 # Database
 DB_PATH = str(CACHE_DIR / "odcv.db")
+# DuckDB resources per process; unset keeps DuckDB's defaults (all cores,
+# 80% of RAM, spilling next to DB_PATH). Size them per gunicorn worker.
+DUCKDB_THREADS = int(os.getenv("DUCKDB_THREADS", 0)) or None
+DUCKDB_MEMORY_LIMIT = os.getenv("DUCKDB_MEMORY_LIMIT") or None
+DUCKDB_TEMP_DIR = os.getenv("DUCKDB_TEMP_DIR") or None  # spill space for large loads
+SCORE_CACHE_SIZE = int(os.getenv("SCORE_CACHE_SIZE", 10000))
 
 # Data file paths
 PLUTO_FILES = {
@@ -67,6 +75,8 @@ R-Zero ODCV Prospecting Tool
 
 Transforms building data into actionable ODCV opportunities.
 """
+API_WORKER_THREADS = int(os.getenv("API_WORKER_THREADS", 32))
+INDEX_CACHE_MAX_AGE = int(os.getenv("INDEX_CACHE_MAX_AGE", 300))  # seconds
 
 # Logging
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
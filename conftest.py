@@ -0,0 +1,16 @@
+"""
+Shared pytest setup for the ODCV app tests
+"""
+import atexit
+import shutil
+import tempfile
+from pathlib import Path
+import config
+
+# The app opens its DuckDB file when main is imported. Point it (and its spill
+# space) at a per-process temp dir so test runs leave cache/ untouched and
+# pytest-xdist workers do not contend for one file lock
+_TEST_DIR = Path(tempfile.mkdtemp(prefix="odcv-tests-"))
+atexit.register(shutil.rmtree, _TEST_DIR, ignore_errors=True)
+config.DB_PATH = str(_TEST_DIR / "odcv.db")
+config.DUCKDB_TEMP_DIR = str(_TEST_DIR / "duckdb.tmp")
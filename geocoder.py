@@ -2,18 +2,56 @@
 NYC Address Geocoding Module
 Converts addresses to BBL using NYC Geoclient API
 """
+import functools
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional, Dict
+import orjson
 from geoclient import Geoclient
 import config
 
 logger = logging.getLogger(__name__)
 
 
+# Sample buildings for demo, keyed by normalized (lowercase) street address
+_MOCK_ADDRESSES = {
+    "1155 avenue of the americas": {
+        'bbl': '1010130029',
+        'address': '1155 AVENUE OF THE AMERICAS',
+        'borough': 'MANHATTAN',
+        'zipCode': '10036'
+    },
+    "80 maiden lane": {
+        'bbl': '1000420031',
+        'address': '80 MAIDEN LANE',
+        'borough': 'MANHATTAN',
+        'zipCode': '10038'
+    },
+    "77 water street": {
+        'bbl': '1000700001',
+        'address': '77 WATER STREET',
+        'borough': 'MANHATTAN',
+        'zipCode': '10005'
+    },
+    "140 broadway": {
+        'bbl': '1000380001',
+        'address': '140 BROADWAY',
+        'borough': 'MANHATTAN',
+        'zipCode': '10005'
+    },
+    "200 e 42nd street": {
+        'bbl': '1000730001',
+        'address': '200 E 42ND STREET',
+        'borough': 'MANHATTAN',
+        'zipCode': '10017'
+    }
+}
+
+
 class NYCGeocoder:
     """Handle NYC address geocoding"""
     
-    def __init__(self):
+    def __init__(self, db=None):
         if not config.GEOCLIENT_APP_ID or not config.GEOCLIENT_APP_KEY:
             logger.warning("Geoclient API credentials not configured")
             self.client = None
@@ -22,6 +60,23 @@ class NYCGeocoder:
                 config.GEOCLIENT_APP_ID,
                 config.GEOCLIENT_APP_KEY
             )
+        
+        # DuckDB connection backing the persistent cache (optional)
+        self.db = db
+        if self.db is not None:
+            self.db.execute("""
+            CREATE TABLE IF NOT EXISTS geocode_cache (
+                address_norm VARCHAR PRIMARY KEY,
+                bbl VARCHAR,
+                payload JSON,
+                ts TIMESTAMP
+            )
+            """)
+        
+        # In-process cache in front of the DuckDB one
+        self._cached_geocode = functools.lru_cache(
+            maxsize=config.GEOCODE_CACHE_SIZE
+        )(self._geocode_cached)
     
     def geocode_address(self, address: str, borough: Optional[str] = None) -> Optional[Dict]:
         """
@@ -38,6 +93,63 @@ class NYCGeocoder:
             # Fallback for demo/testing without API credentials
             return self._mock_geocode(address, borough)
         
+        try:
+            return dict(self._cached_geocode(address, borough))
+        except LookupError:
+            return None
+    
+    def _geocode_cached(self, address: str, borough: Optional[str]) -> Dict:
+        """Resolve through the DuckDB cache, raising LookupError on a miss upstream"""
+        key = self._cache_key(address, borough)
+        
+        result = self._read_cache(key)
+        if result is None:
+            result = self._geocode_upstream(address, borough)
+            if result is None:
+                # Raised rather than returned so failures are not memoized
+                raise LookupError(address)
+            self._write_cache(key, result)
+        
+        return result
+    
+    @staticmethod
+    def _cache_key(address: str, borough: Optional[str]) -> str:
+        """Normalize an address/borough pair into a cache key"""
+        normalized = ' '.join(address.lower().split())
+        if borough:
+            normalized += '|' + ' '.join(borough.lower().split())
+        return normalized
+    
+    def _read_cache(self, key: str) -> Optional[Dict]:
+        """Look up a cached geocode result"""
+        if self.db is None:
+            return None
+        
+        try:
+            row = self.db.cursor().execute(
+                "SELECT payload FROM geocode_cache WHERE address_norm = ?", [key]
+            ).fetchone()
+        except Exception as e:
+            logger.warning(f"Geocode cache read failed for {key}: {e}")
+            return None
+        
+        return orjson.loads(row[0]) if row else None
+    
+    def _write_cache(self, key: str, result: Dict):
+        """Persist a geocode result"""
+        if self.db is None:
+            return
+        
+        try:
+            self.db.cursor().execute(
+                "INSERT OR REPLACE INTO geocode_cache VALUES (?, ?, ?, now())",
+                [key, result['bbl'], orjson.dumps(result).decode()]
+            )
+        except Exception as e:
+            logger.warning(f"Geocode cache write failed for {key}: {e}")
+    
+    def _geocode_upstream(self, address: str, borough: Optional[str]) -> Optional[Dict]:
+        """Geocode an address with the Geoclient API"""
         try:
             # Parse address components
             if not borough and ',' in address:
@@ -80,45 +192,14 @@ class NYCGeocoder:
     
     def _mock_geocode(self, address: str, borough: Optional[str]) -> Optional[Dict]:
         """Mock geocoding for testing without API credentials"""
-        # Sample buildings for demo
-        mock_data = {
-            "1155 avenue of the americas": {
-                'bbl': '1010130029',
-                'address': '1155 AVENUE OF THE AMERICAS',
-                'borough': 'MANHATTAN',
-                'zipCode': '10036'
-            },
-            "80 maiden lane": {
-                'bbl': '1000420031',
-                'address': '80 MAIDEN LANE',
-                'borough': 'MANHATTAN',
-                'zipCode': '10038'
-            },
-            "77 water street": {
-                'bbl': '1000700001',
-                'address': '77 WATER STREET',
-                'borough': 'MANHATTAN',
-                'zipCode': '10005'
-            },
-            "140 broadway": {
-                'bbl': '1000380001',
-                'address': '140 BROADWAY',
-                'borough': 'MANHATTAN',
-                'zipCode': '10005'
-            },
-            "200 e 42nd street": {
-                'bbl': '1000730001',
-                'address': '200 E 42ND STREET',
-                'borough': 'MANHATTAN',
-                'zipCode': '10017'
-            }
-        }
-        
-        # Normalize address for lookup
+        # Normalize address for lookup; the street part before the borough/city
+        # is usually an exact key, otherwise fall back to a substring match
         normalized = address.lower().strip()
-        for key, data in mock_data.items():
-            if key in normalized:
-                return data
+        data = _MOCK_ADDRESSES.get(normalized.split(',', 1)[0].strip())
+        if data is None:
+            data = next((v for k, v in _MOCK_ADDRESSES.items() if k in normalized), None)
+        if data is not None:
+            return dict(data)
         
         # Generate a fake BBL for unknown addresses
         return {
@@ -129,8 +210,11 @@ class NYCGeocoder:
         }
     
     def batch_geocode(self, addresses: list) -> Dict[str, Optional[Dict]]:
-        """Geocode multiple addresses"""
-        results = {}
-        for address in addresses:
-            results[address] = self.geocode_address(address)
-        return results
+        """Geocode multiple addresses concurrently"""
+        if not addresses:
+            return {}
+        
+        # Lookups are network-bound, so threads overlap the HTTP round trips
+        workers = min(config.GEOCODE_MAX_WORKERS, len(addresses))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return dict(zip(addresses, executor.map(self.geocode_address, addresses)))
@@ -2,14 +2,16 @@
 ODCV Building Intelligence API
 FastAPI application for building assessment and ODCV opportunity scoring
 """
+import functools
 import logging
+import anyio
 from typing import List, Optional, Dict
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse, FileResponse
+from fastapi.openapi.docs import get_swagger_ui_html, get_swagger_ui_oauth2_redirect_html
+from fastapi.responses import HTMLResponse, FileResponse, ORJSONResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel, Field
-import pandas as pd
 from pathlib import Path
 
 import config
@@ -28,7 +30,9 @@ logger = logging.getLogger(__name__)
 app = FastAPI(
     title=config.API_TITLE,
     version=config.API_VERSION,
-    description=config.API_DESCRIPTION
+    description=config.API_DESCRIPTION,
+    default_response_class=ORJSONResponse,
+    docs_url=None  # served below from a cached render
 )
 
 # Add CORS middleware
@@ -42,7 +46,7 @@ app.add_middleware(
 
 # Initialize services
 data_loader = NYCDataLoader()
-geocoder = NYCGeocoder()
+geocoder = NYCGeocoder(db=data_loader.db)
 scorer = ODCVScorer()
 
 # Load data on startup
@@ -50,6 +54,8 @@ scorer = ODCVScorer()
 async def startup_event():
     """Load all datasets on startup"""
     logger.info("Starting ODCV API...")
+    # Bound the worker threads that endpoints offload blocking work to
+    anyio.to_thread.current_default_thread_limiter().total_tokens = config.API_WORKER_THREADS
     try:
         data_loader.load_all_datasets()
         logger.info("Data loaded successfully")
@@ -102,31 +108,57 @@ class SearchFilters(BaseModel):
 static_path = Path(__file__).parent / "static"
 static_path.mkdir(exist_ok=True)
 
-# Save index.html to static directory if it doesn't exist
+# Resolve the web interface once: prefer static/, fall back to the project root
 index_path = static_path / "index.html"
 if not index_path.exists():
-    # This would normally be copied from the index.html artifact
-    # For now, we'll serve from root
-    pass
+    index_path = config.BASE_DIR / "index.html"
+
+FALLBACK_HTML = """
+<html>
+    <body>
+        <h1>ODCV Building Intelligence</h1>
+        <p>Please ensure index.html is in the project root directory.</p>
+        <p>API Documentation: <a href="/docs">/docs</a></p>
+    </body>
+</html>
+"""
+
+
+@functools.lru_cache(maxsize=8)
+def _docs_html(root_path: str) -> bytes:
+    """Render the Swagger UI page once per mount path"""
+    return get_swagger_ui_html(
+        openapi_url=root_path + app.openapi_url,
+        title=f"{app.title} - Swagger UI",
+        oauth2_redirect_url=root_path + app.swagger_ui_oauth2_redirect_url,
+        init_oauth=app.swagger_ui_init_oauth,
+        swagger_ui_parameters=app.swagger_ui_parameters,
+    ).body
+
+
+@app.get("/docs", include_in_schema=False)
+async def swagger_ui_html(request: Request):
+    """Interactive API documentation"""
+    return HTMLResponse(_docs_html(request.scope.get("root_path", "").rstrip("/")))
+
+
+@app.get(app.swagger_ui_oauth2_redirect_url, include_in_schema=False)
+async def swagger_ui_redirect():
+    """OAuth2 redirect page for the API documentation"""
+    return get_swagger_ui_oauth2_redirect_html()
+
 
 # API Endpoints
 @app.get("/", response_class=FileResponse)
 async def root():
     """Serve the web interface"""
-    # Check if index.html exists in static directory
     if index_path.exists():
-        return FileResponse(index_path)
-    else:
-        # Return the embedded HTML for now
-        return HTMLResponse(content=open('index.html').read() if Path('index.html').exists() else """
-        <html>
-            <body>
-                <h1>ODCV Building Intelligence</h1>
-                <p>Please ensure index.html is in the project root directory.</p>
-                <p>API Documentation: <a href="/docs">/docs</a></p>
-            </body>
-        </html>
-        """)
+        # FileResponse streams from disk off the event loop and sets ETag/Last-Modified;
+        # browsers may reuse the page between visits
+        return FileResponse(index_path, headers={
+            "Cache-Control": f"public, max-age={config.INDEX_CACHE_MAX_AGE}"
+        })
+    return HTMLResponse(content=FALLBACK_HTML)
 
 
 @app.get("/api/geocode")
@@ -158,6 +190,11 @@ async def score_building(request: AddressRequest):
     if not geo_result:
         raise HTTPException(status_code=404, detail="Address not found")
     
+    # Serve repeat requests from the score cache
+    score = data_loader.get_cached_score(geo_result['bbl'], scorer.fingerprint)
+    if score:
+        return score
+    
     # Get building data
     building = data_loader.get_building_by_bbl(geo_result['bbl'])
     if not building:
@@ -171,31 +208,72 @@ async def score_building(request: AddressRequest):
     
     # Score building
     score = scorer.score_building(building)
+    data_loader.cache_score(geo_result['bbl'], score, scorer.fingerprint)
     return score
 
 
-@app.post("/api/score/bulk")
-async def score_buildings_batch(addresses: List[str]):
-    """Score multiple buildings at once"""
-    results = []
+def _score_batch(addresses: List[str]) -> List[Dict]:
+    """Geocode, look up and score a batch of addresses (blocking)"""
+    geo_results = geocoder.batch_geocode(addresses)
+    geocoded = [
+        (geo_result['bbl'], geo_result['address'])
+        for geo_result in (geo_results[address] for address in addresses)
+        if geo_result
+    ]
+    
+    # Fetch every matched building in one query
+    bbls = list({bbl for bbl, _ in geocoded})
+    buildings_by_bbl = {
+        building['BBL']: building
+        for building in data_loader.get_buildings_by_bbls(bbls)
+    }
     
-    for address in addresses[:50]:  # Limit to 50 addresses
+    buildings = [
+        {**buildings_by_bbl[bbl], 'address': address}
+        for bbl, address in geocoded
+        if bbl in buildings_by_bbl
+    ]
+    
+    # Score and sort by score
+    try:
+        return score_buildings_bulk(buildings)
+    except Exception as e:
+        logger.error(f"Bulk scoring failed, scoring addresses one by one: {e}")
+    
+    # Isolate the bad rows so one building cannot fail the whole batch
+    results = []
+    for building in buildings:
         try:
-            geo_result = geocoder.geocode_address(address)
-            if geo_result:
-                building = data_loader.get_building_by_bbl(geo_result['bbl'])
-                if building:
-                    building['address'] = geo_result['address']
-                    score = scorer.score_building(building)
-                    results.append(score)
+            results.append(scorer.score_building(building))
         except Exception as e:
-            logger.error(f"Error scoring {address}: {e}")
+            logger.error(f"Error scoring {building['address']}: {e}")
     
-    # Sort by score
     results.sort(key=lambda x: x['total_score'], reverse=True)
     return results
 
 
+def _score_search(filters: Dict, limit: int) -> List[Dict]:
+    """Rank matching buildings in DuckDB and score the top rows (blocking)"""
+    results = data_loader.search_buildings(
+        filters, order_by=scorer.score_sql(), limit=limit
+    )
+    
+    if results.num_rows == 0:
+        return []
+    
+    return score_buildings_bulk(results)
+
+
+@app.post("/api/score/bulk")
+async def score_buildings_batch(addresses: List[str]):
+    """Score multiple buildings at once"""
+    addresses = addresses[:50]  # Limit to 50 addresses
+    
+    # DuckDB and Geoclient calls release the GIL, so run them on a worker
+    # thread and keep the event loop free for other requests
+    return await anyio.to_thread.run_sync(_score_batch, addresses)
+
+
 @app.get("/api/search")
 async def search_buildings(
     min_size: Optional[int] = Query(None, description="Minimum building size (sq ft)"),
@@ -214,16 +292,8 @@ async def search_buildings(
     # Remove None values
     filters = {k: v for k, v in filters.items() if v is not None}
     
-    results_df = data_loader.search_buildings(filters)
-    
-    if results_df.empty:
-        return []
-    
-    # Convert to dict and score each building
-    buildings = results_df.to_dict('records')
-    scored = score_buildings_bulk(buildings)
-    
-    return scored[:50]  # Return top 50
+    # Rank in DuckDB so only the top 50 rows reach Python
+    return await anyio.to_thread.run_sync(_score_search, filters, 50)
 
 
 @app.get("/api/opportunities")
@@ -235,40 +305,21 @@ async def get_top_opportunities(limit: int = Query(10, le=100)):
         'max_occupancy': 80  # Focus on low occupancy
     }
     
-    results_df = data_loader.search_buildings(filters)
-    
-    if results_df.empty:
-        return []
-    
-    buildings = results_df.to_dict('records')
-    scored = score_buildings_bulk(buildings)
-    
-    return scored[:limit]
+    return await anyio.to_thread.run_sync(_score_search, filters, limit)
 
 
 @app.get("/api/stats")
 async def get_statistics():
     """Get dataset statistics"""
-    stats_query = """
-    SELECT 
-        COUNT(*) as total_buildings,
-        COUNT(CASE WHEN has_vav = true THEN 1 END) as vav_buildings,
-        COUNT(CASE WHEN occupancy_percent < 70 THEN 1 END) as low_occupancy,
-        COUNT(CASE WHEN energy_grade IN ('D', 'F') THEN 1 END) as poor_grade,
-        AVG(CAST(site_eui AS FLOAT)) as avg_eui,
-        AVG(CAST(occupancy_percent AS FLOAT)) as avg_occupancy
-    FROM building_profiles
-    """
-    
-    result = data_loader.conn.execute(stats_query).fetchone()
+    stats = data_loader.get_statistics()
     
     return {
-        'total_buildings': result[0],
-        'vav_buildings': result[1],
-        'low_occupancy_buildings': result[2],
-        'poor_grade_buildings': result[3],
-        'average_eui': round(result[4], 1) if result[4] else 0,
-        'average_occupancy': round(result[5], 1) if result[5] else 0
+        'total_buildings': stats['total_buildings'],
+        'vav_buildings': stats['vav_buildings'],
+        'low_occupancy_buildings': stats['low_occupancy'],
+        'poor_grade_buildings': stats['poor_grade'],
+        'average_eui': round(stats['avg_eui'], 1) if stats['avg_eui'] else 0,
+        'average_occupancy': round(stats['avg_occupancy'], 1) if stats['avg_occupancy'] else 0
     }
 
 
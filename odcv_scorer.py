@@ -2,24 +2,301 @@
 ODCV Opportunity Scoring Algorithm
 Evaluates buildings for Occupancy-Driven Control Ventilation potential
 """
+import bisect
+import functools
+import hashlib
+import json
 import logging
-from typing import Dict, List, Optional
+from enum import IntFlag
+from types import MappingProxyType
+from typing import Dict, List, Optional, Tuple, Union
 from datetime import datetime
+import numpy as np
+import pyarrow as pa
 import config
+from odcv_scorer_kernel import (
+    GRADE_CODES, UNKNOWN_GRADE, encode_grades, grade_mask, score_columns
+)
 
 logger = logging.getLogger(__name__)
 
+# Bump whenever a change to the scoring code alters results, so cached
+# scores from the previous algorithm are no longer served
+SCORER_VERSION = 1
+
+
+# Columns read by ODCVScorer.score_building
+SCORED_FIELDS = (
+    'bbl', 'address', 'size_sqft', 'year_built', 'floors', 'owner_type',
+    'occupancy_percent', 'site_eui', 'energy_grade', 'active_meters',
+    'has_vav', 'has_dcv', 'has_bms',
+)
+
+# Values assumed for scored fields that are missing or NULL
+FIELD_DEFAULTS = {
+    'size_sqft': 100000,
+    'year_built': 2020,
+    'floors': 10,
+    'owner_type': '',
+    'occupancy_percent': 100,
+    'site_eui': 0,
+    'energy_grade': 'N',
+    'active_meters': 1,
+    'has_bms': False,
+}
+
+# Opportunity level and action by total score: below 40, 40-59, 60-79, 80+
+_LEVEL_THRESHOLDS = (40, 60, 80)
+_LEVELS = ('LOW', 'MEDIUM', 'MEDIUM-HIGH', 'HIGH')
+_ACTIONS = (
+    'Focus on other measures',
+    'Consider with other upgrades',
+    'Schedule detailed assessment',
+    'Immediate implementation recommended',
+)
+
+def _field(building: Dict, key: str, default=None):
+    """Read a building field, treating NULLs from the database as missing"""
+    value = building.get(key)
+    if value is None:
+        return FIELD_DEFAULTS[key] if default is None else default
+    return value
+
+
+class FlagCode(IntFlag):
+    """Machine-readable codes for the human-readable result flags"""
+    LOW_OCCUPANCY = 1
+    GOOD_OCCUPANCY = 2
+    POOR_GRADE = 4
+    HIGH_EUI = 8
+    BMS_PRESENT = 16
+    NO_BMS = 32
+    HAS_DCV = 64
+    CORP_OWNER = 128
+    GOOD_MV = 256
+    NO_DCV = 512
+    BELOW_MIN_SIZE = 1024
+    INCOMPATIBLE = 2048
+    
+    @classmethod
+    def from_flags(cls, flags: List[str]) -> 'FlagCode':
+        """Recover codes from flag text, for results scored before flag_bits"""
+        bits = cls(0)
+        for text in flags:
+            for prefix, code in _FLAG_PREFIXES:
+                if text.startswith(prefix):
+                    bits |= code
+            if text.endswith('active meters - good M&V'):
+                bits |= cls.GOOD_MV
+        return bits
+
+
+_FLAG_PREFIXES = (
+    ('MAJOR OPPORTUNITY', FlagCode.LOW_OCCUPANCY),
+    ('GOOD OPPORTUNITY', FlagCode.GOOD_OCCUPANCY),
+    ('Poor energy grade', FlagCode.POOR_GRADE),
+    ('High EUI', FlagCode.HIGH_EUI),
+    ('BMS present', FlagCode.BMS_PRESENT),
+    ('No BMS', FlagCode.NO_BMS),
+    ('Has CO2 DCV', FlagCode.HAS_DCV),
+    ('No DCV', FlagCode.NO_DCV),
+    ('Corporate owner', FlagCode.CORP_OWNER),
+    ('WARNING: Below minimum size', FlagCode.BELOW_MIN_SIZE),
+    ('INCOMPATIBLE', FlagCode.INCOMPATIBLE),
+)
+
+
+# Result for buildings without VAV, in score_building key order; the
+# mutable fields are filled in fresh by _incompatible_result
+_INCOMPATIBLE_RESULT_TEMPLATE = MappingProxyType({
+    'bbl': None,
+    'address': None,
+    'total_score': 0,
+    'score_components': None,
+    'savings_potential_percent': 0,
+    'annual_savings_dollars': 0,
+    'deployment_complexity': 'Unknown',
+    'implementation_plan': None,
+    'recommendations': None,
+    'flags': None,
+    'flag_bits': FlagCode.INCOMPATIBLE
+})
+
+
+@functools.lru_cache(maxsize=1024)
+def _compat_verdict(has_vav: bool,
+                    below_min_size: bool) -> Tuple[bool, Tuple[str, ...],
+                                                   Tuple[str, ...], FlagCode]:
+    """ODCV compatibility as (compatible, flags, recommendations, flag bits)"""
+    if not has_vav:
+        return (
+            False,
+            ('INCOMPATIBLE: No VAV system',),
+            ('Building has CAV system - VAV retrofit required before ODCV',),
+            FlagCode.INCOMPATIBLE
+        )
+    if below_min_size:
+        return (True, ('WARNING: Below minimum size threshold',), (),
+                FlagCode.BELOW_MIN_SIZE)
+    return (True, (), (), FlagCode(0))
+
+
+def _incompatible_result(bbl: Optional[str], address: Optional[str]) -> Dict:
+    """Result for a building ODCV cannot serve until it has VAV"""
+    _, flags, recommendations, _ = _compat_verdict(False, False)
+    return {
+        **_INCOMPATIBLE_RESULT_TEMPLATE,
+        'bbl': bbl,
+        'address': address,
+        'score_components': {},
+        'implementation_plan': {},
+        'recommendations': list(recommendations),
+        'flags': list(flags)
+    }
+
+
+# Flag text per code, in the order results list it; the size warning comes
+# first, from _compat_verdict. Placeholders take the building's raw values.
+_FLAG_TEXT = (
+    (FlagCode.LOW_OCCUPANCY, 'MAJOR OPPORTUNITY: Only {occupancy}% occupied'),
+    (FlagCode.GOOD_OCCUPANCY, 'GOOD OPPORTUNITY: {occupancy}% occupied'),
+    (FlagCode.POOR_GRADE, 'Poor energy grade: {grade}'),
+    (FlagCode.HIGH_EUI, 'High EUI: {eui} kBtu/sq ft'),
+    (FlagCode.BMS_PRESENT, 'BMS present - easy integration'),
+    (FlagCode.NO_BMS, 'No BMS - standalone system needed'),
+    (FlagCode.HAS_DCV, 'Has CO2 DCV - upgrade to ODCV'),
+    (FlagCode.NO_DCV, 'No DCV - new installation'),
+    (FlagCode.CORP_OWNER, 'Corporate owner - faster decisions'),
+    (FlagCode.GOOD_MV, '{meters} active meters - good M&V'),
+)
+
+
+def _flag_text(flag_bits: FlagCode, occupancy, grade, eui, meters) -> List[str]:
+    """Human-readable flags for the scoring codes set in flag_bits"""
+    return [
+        text.format(occupancy=occupancy, grade=grade, eui=eui, meters=meters)
+        for code, text in _FLAG_TEXT if flag_bits & code
+    ]
+
+
+def _recommendations(flag_bits: FlagCode, total_score: int,
+                     occupancy, grade) -> List[str]:
+    """Recommended actions for a scored building"""
+    recs = []
+    
+    # Primary recommendation based on score
+    if total_score >= 80:
+        recs.append('IMMEDIATE ACTION: Schedule ODCV deployment assessment')
+    elif total_score >= 60:
+        recs.append('GOOD CANDIDATE: Include in next quarter planning')
+    
+    # Specific technical recommendations
+    if flag_bits & FlagCode.HAS_DCV:
+        recs.append(
+            'Upgrade existing CO2-based DCV to occupancy-based control '
+            'for 10-15% additional savings'
+        )
+    else:
+        recs.append(
+            'Install new ODCV system with occupancy sensors at AHU level'
+        )
+    
+    if flag_bits & FlagCode.BMS_PRESENT:
+        recs.append(
+            'Integrate ODCV with existing BMS for centralized control'
+        )
+    else:
+        recs.append(
+            'Deploy standalone ODCV system with cloud-based monitoring'
+        )
+    
+    # Occupancy-specific recommendations
+    if flag_bits & FlagCode.LOW_OCCUPANCY:
+        recs.append(
+            f'With only {occupancy}% occupancy, prioritize vacant floor '
+            'detection to maximize savings'
+        )
+    
+    # Energy grade recommendations
+    if flag_bits & FlagCode.POOR_GRADE:
+        recs.append(
+            f'Current grade {grade} indicates significant waste - '
+            'ODCV can help achieve grade C or better'
+        )
+    return recs
+
+
+def _implementation_plan(ahu_count: int, sensor_count: int, has_bms: bool,
+                         weeks: int, cost, cost_per_sqft: float) -> Dict:
+    """Implementation plan section of a result"""
+    return {
+        'ahu_count': ahu_count,
+        'sensor_count': sensor_count,
+        'sensor_locations': 'Mechanical rooms and lobbies only',
+        'integration_type': ('BACnet integration with existing BMS' if has_bms
+                             else 'Standalone ODCV system with cloud connectivity'),
+        'deployment_weeks': weeks,
+        'tenant_disruption': 'None - all work in mechanical spaces',
+        'control_points': f'{ahu_count} OA dampers at AHU level',
+        'estimated_cost': cost,
+        'cost_per_sqft': cost_per_sqft
+    }
+
+
+def _financial_analysis(annual_hvac_cost: float, annual_savings: float,
+                        impl_cost) -> Dict:
+    """Financial analysis section of a result"""
+    # Payback
+    if annual_savings > 0:
+        simple_payback = impl_cost / annual_savings
+    else:
+        simple_payback = 999
+    
+    return {
+        'estimated_annual_hvac_cost': round(annual_hvac_cost),
+        'annual_savings_dollars': round(annual_savings),
+        'implementation_cost': impl_cost,
+        'simple_payback_years': round(simple_payback, 1),
+        'roi_percent': round((annual_savings / impl_cost) * 100, 1) if impl_cost > 0 else 0,
+        'npv_10_year': round(annual_savings * 10 - impl_cost)
+    }
+
 
 class ODCVScorer:
     """Calculate ODCV opportunity scores for buildings"""
     
     def __init__(self):
         self.params = config.ODCV_PARAMS
+        
+        # Resolve parameters once; the scoring methods run per building
+        self._min_size = self.params['min_building_size']
+        self._poor_grades = frozenset(self.params['poor_grades'])
+        self._medium_grade = self.params['medium_grade']
+        self._high_eui_threshold = self.params['high_eui_threshold']
+        self._ahu_per_floors = self.params['ahu_per_floors']
+        self._sensor_cost = self.params['sensor_cost']
+        self._weeks_bms = self.params['integration_weeks_with_bms']
+        self._weeks_no_bms = self.params['integration_weeks_without_bms']
+        
+        # Building age is measured against the year the scorer was created;
+        # long-running services should not reuse a scorer across New Year
+        self._current_year = datetime.now().year
+        
+        # Identifies the algorithm, parameters and year behind a score
+        self.fingerprint = hashlib.sha1(json.dumps(
+            [SCORER_VERSION, self._current_year, self.params],
+            sort_keys=True, default=str
+        ).encode()).hexdigest()
     
-    def score_building(self, building: Dict) -> Dict:
+    def score_building(self, building: Dict, year: Optional[int] = None) -> Dict:
         """
         Score a building for ODCV opportunity
         
+        Args:
+            building: Building profile fields
+            year: Year to measure building age against (defaults to the
+                scorer's current year), e.g. for historical batches
+        
         Returns dict with:
         - total_score: 0-100
         - savings_potential: estimated % HVAC savings
@@ -27,6 +304,15 @@ class ODCVScorer:
         - implementation_plan: deployment details
         - recommendations: specific actions
         """
+        # Check basic compatibility; ODCV needs VAV, so skip building the
+        # scoring scaffolding without it
+        compatible, flags, recommendations, flag_bits = _compat_verdict(
+            bool(building.get('has_vav')),
+            _field(building, 'size_sqft', 0) < self._min_size
+        )
+        if not compatible:
+            return _incompatible_result(building.get('bbl'), building.get('address'))
+        
         # Initialize scoring components
         result = {
             'bbl': building.get('bbl'),
@@ -37,16 +323,15 @@ class ODCVScorer:
             'annual_savings_dollars': 0,
             'deployment_complexity': 'Unknown',
             'implementation_plan': {},
-            'recommendations': [],
-            'flags': []
+            'recommendations': list(recommendations),
+            'flags': list(flags),
+            'flag_bits': flag_bits
         }
         
-        # Check basic compatibility
-        if not self._check_compatibility(building, result):
-            return result
-        
         # Calculate component scores
-        savings_score = self._score_savings_potential(building, result)
+        savings_score = self._score_savings_potential(
+            building, result, year or self._current_year
+        )
         deployment_score = self._score_deployment_ease(building, result)
         
         # Calculate total score (0-100)
@@ -55,74 +340,83 @@ class ODCVScorer:
         # Generate implementation plan
         self._generate_implementation_plan(building, result)
         
-        # Generate recommendations
-        self._generate_recommendations(building, result)
+        # Flag text and recommendations follow from the codes set above
+        occupancy = _field(building, 'occupancy_percent')
+        grade = _field(building, 'energy_grade')
+        result['flags'] += _flag_text(
+            result['flag_bits'], occupancy, grade,
+            _field(building, 'site_eui'), _field(building, 'active_meters')
+        )
+        result['recommendations'] += _recommendations(
+            result['flag_bits'], result['total_score'], occupancy, grade
+        )
         
         # Calculate financial metrics
         self._calculate_financials(building, result)
         
         # Determine opportunity level
-        if result['total_score'] >= 80:
-            result['opportunity_level'] = 'HIGH'
-            result['action'] = 'Immediate implementation recommended'
-        elif result['total_score'] >= 60:
-            result['opportunity_level'] = 'MEDIUM-HIGH'
-            result['action'] = 'Schedule detailed assessment'
-        elif result['total_score'] >= 40:
-            result['opportunity_level'] = 'MEDIUM'
-            result['action'] = 'Consider with other upgrades'
-        else:
-            result['opportunity_level'] = 'LOW'
-            result['action'] = 'Focus on other measures'
+        level = bisect.bisect_right(_LEVEL_THRESHOLDS, result['total_score'])
+        result['opportunity_level'] = _LEVELS[level]
+        result['action'] = _ACTIONS[level]
         
         return result
     
-    def _check_compatibility(self, building: Dict, result: Dict) -> bool:
-        """Check if building is compatible with ODCV"""
-        # Must have VAV system
-        if not building.get('has_vav'):
-            result['flags'].append('INCOMPATIBLE: No VAV system')
-            result['recommendations'].append(
-                'Building has CAV system - VAV retrofit required before ODCV'
-            )
-            return False
-        
-        # Check size
-        size = building.get('size_sqft', 0)
-        if size < self.params['min_building_size']:
-            result['flags'].append('WARNING: Below minimum size threshold')
-        
-        return True
+    def score_sql(self) -> str:
+        """
+        SQL expression for total_score over building_profiles columns
+        
+        Mirrors score_building so buildings can be ranked inside DuckDB;
+        keep the two in sync when changing weights or thresholds.
+        """
+        poor_grades = ", ".join(f"'{g}'" for g in self.params['poor_grades'])
+        year = self._current_year
+        
+        return f"""(CASE WHEN NOT coalesce(has_vav, false) THEN 0 ELSE least(100,
+            CASE WHEN coalesce(occupancy_percent, 100) < 60 THEN 20
+                 WHEN coalesce(occupancy_percent, 100) < 80 THEN 12 ELSE 5 END
+          + CASE WHEN coalesce(energy_grade, 'N') IN ({poor_grades}) THEN 15
+                 WHEN coalesce(energy_grade, 'N') = '{self.params['medium_grade']}' THEN 8
+                 ELSE 3 END
+          + CASE WHEN coalesce(site_eui, 0) > {self.params['high_eui_threshold']} THEN 10
+                 WHEN coalesce(site_eui, 0) > 80 THEN 5 ELSE 0 END
+          + CASE WHEN {year} - coalesce(year_built, 2020) > 40 THEN 5
+                 WHEN {year} - coalesce(year_built, 2020) > 20 THEN 3 ELSE 0 END
+          + CASE WHEN coalesce(has_bms, false) THEN 20 ELSE 5 END
+          + CASE WHEN coalesce(has_dcv, false) THEN 15 ELSE 10 END
+          + CASE WHEN owner_type = 'C' THEN 10 ELSE 5 END
+          + CASE WHEN coalesce(active_meters, 1) >= 3 THEN 5 ELSE 0 END
+        ) END)"""
     
-    def _score_savings_potential(self, building: Dict, result: Dict) -> float:
+    def _score_savings_potential(self, building: Dict, result: Dict,
+                                 year: int) -> int:
         """Score the energy savings potential (0-50 points)"""
         score = 0
         components = {}
         
         # 1. Occupancy factor (0-20 points) - Most important!
-        occupancy = building.get('occupancy_percent', 100)
+        occupancy = _field(building, 'occupancy_percent')
         if occupancy < 60:
             score += 20
             components['occupancy'] = 20
             result['savings_potential_percent'] = 30
-            result['flags'].append(f'MAJOR OPPORTUNITY: Only {occupancy}% occupied')
+            result['flag_bits'] |= FlagCode.LOW_OCCUPANCY
         elif occupancy < 80:
             score += 12
             components['occupancy'] = 12
             result['savings_potential_percent'] = 20
-            result['flags'].append(f'GOOD OPPORTUNITY: {occupancy}% occupied')
+            result['flag_bits'] |= FlagCode.GOOD_OCCUPANCY
         else:
             score += 5
             components['occupancy'] = 5
             result['savings_potential_percent'] = 10
         
         # 2. Energy performance (0-15 points)
-        grade = building.get('energy_grade', 'N')
-        if grade in self.params['poor_grades']:
+        grade = _field(building, 'energy_grade')
+        if grade in self._poor_grades:
             score += 15
             components['energy_grade'] = 15
-            result['flags'].append(f'Poor energy grade: {grade}')
-        elif grade == self.params['medium_grade']:
+            result['flag_bits'] |= FlagCode.POOR_GRADE
+        elif grade == self._medium_grade:
             score += 8
             components['energy_grade'] = 8
         else:
@@ -130,18 +424,18 @@ class ODCVScorer:
             components['energy_grade'] = 3
         
         # 3. EUI factor (0-10 points)
-        eui = building.get('site_eui', 0)
-        if eui > self.params['high_eui_threshold']:
+        eui = _field(building, 'site_eui')
+        if eui > self._high_eui_threshold:
             score += 10
             components['eui'] = 10
-            result['flags'].append(f'High EUI: {eui} kBtu/sq ft')
+            result['flag_bits'] |= FlagCode.HIGH_EUI
         elif eui > 80:
             score += 5
             components['eui'] = 5
         
         # 4. System age (0-5 points)
-        year_built = building.get('year_built', 2020)
-        age = datetime.now().year - year_built
+        year_built = _field(building, 'year_built')
+        age = year - year_built
         if age > 40:
             score += 5
             components['building_age'] = 5
@@ -152,7 +446,7 @@ class ODCVScorer:
         result['score_components']['savings_potential'] = components
         return score
     
-    def _score_deployment_ease(self, building: Dict, result: Dict) -> float:
+    def _score_deployment_ease(self, building: Dict, result: Dict) -> int:
         """Score how easy it is to deploy ODCV (0-50 points)"""
         score = 0
         components = {}
@@ -162,123 +456,69 @@ class ODCVScorer:
             score += 20
             components['bms'] = 20
             result['deployment_complexity'] = 'LOW'
-            result['flags'].append('BMS present - easy integration')
+            result['flag_bits'] |= FlagCode.BMS_PRESENT
         else:
             score += 5
             components['bms'] = 5
             result['deployment_complexity'] = 'MEDIUM'
-            result['flags'].append('No BMS - standalone system needed')
+            result['flag_bits'] |= FlagCode.NO_BMS
         
         # 2. Existing DCV (0-15 points)
         if building.get('has_dcv'):
             score += 15
             components['existing_dcv'] = 15
-            result['flags'].append('Has CO2 DCV - upgrade to ODCV')
+            result['flag_bits'] |= FlagCode.HAS_DCV
         else:
             score += 10
             components['existing_dcv'] = 10
-            result['flags'].append('No DCV - new installation')
+            result['flag_bits'] |= FlagCode.NO_DCV
         
         # 3. Owner type (0-10 points)
-        owner_type = building.get('owner_type', '')
+        owner_type = _field(building, 'owner_type')
         if owner_type == 'C':  # Corporate
             score += 10
             components['owner_type'] = 10
-            result['flags'].append('Corporate owner - faster decisions')
+            result['flag_bits'] |= FlagCode.CORP_OWNER
         else:
             score += 5
             components['owner_type'] = 5
         
         # 4. M&V capability (0-5 points)
-        meters = building.get('active_meters', 1)
+        meters = _field(building, 'active_meters')
         if meters >= 3:
             score += 5
             components['metering'] = 5
-            result['flags'].append(f'{meters} active meters - good M&V')
+            result['flag_bits'] |= FlagCode.GOOD_MV
         
         result['score_components']['deployment_ease'] = components
         return score
     
-    def _generate_implementation_plan(self, building: Dict, result: Dict):
+    def _generate_implementation_plan(self, building: Dict, result: Dict) -> None:
         """Generate specific implementation plan"""
-        floors = building.get('floors', 10)
-        size = building.get('size_sqft', 100000)
-        has_bms = building.get('has_bms', False)
+        floors = _field(building, 'floors')
+        size = _field(building, 'size_sqft')
+        has_bms = _field(building, 'has_bms')
         
         # Estimate AHU count
-        ahu_count = max(1, floors // self.params['ahu_per_floors'])
+        ahu_count = max(1, floors // self._ahu_per_floors)
         
         # Sensor deployment strategy
         if has_bms:
             sensor_count = ahu_count + 2  # AHUs + lobby + sample
-            integration = 'BACnet integration with existing BMS'
-            weeks = self.params['integration_weeks_with_bms']
+            weeks = self._weeks_bms
         else:
             sensor_count = ahu_count + floors // 3  # More sensors needed
-            integration = 'Standalone ODCV system with cloud connectivity'
-            weeks = self.params['integration_weeks_without_bms']
-        
-        result['implementation_plan'] = {
-            'ahu_count': ahu_count,
-            'sensor_count': sensor_count,
-            'sensor_locations': 'Mechanical rooms and lobbies only',
-            'integration_type': integration,
-            'deployment_weeks': weeks,
-            'tenant_disruption': 'None - all work in mechanical spaces',
-            'control_points': f'{ahu_count} OA dampers at AHU level',
-            'estimated_cost': sensor_count * self.params['sensor_cost'],
-            'cost_per_sqft': (sensor_count * self.params['sensor_cost']) / size
-        }
-    
-    def _generate_recommendations(self, building: Dict, result: Dict):
-        """Generate specific recommendations"""
-        recs = result['recommendations']
-        
-        # Primary recommendation based on score
-        if result['total_score'] >= 80:
-            recs.append('IMMEDIATE ACTION: Schedule ODCV deployment assessment')
-        elif result['total_score'] >= 60:
-            recs.append('GOOD CANDIDATE: Include in next quarter planning')
-        
-        # Specific technical recommendations
-        if building.get('has_dcv'):
-            recs.append(
-                'Upgrade existing CO2-based DCV to occupancy-based control '
-                'for 10-15% additional savings'
-            )
-        else:
-            recs.append(
-                'Install new ODCV system with occupancy sensors at AHU level'
-            )
+            weeks = self._weeks_no_bms
         
-        if building.get('has_bms'):
-            recs.append(
-                'Integrate ODCV with existing BMS for centralized control'
-            )
-        else:
-            recs.append(
-                'Deploy standalone ODCV system with cloud-based monitoring'
-            )
-        
-        # Occupancy-specific recommendations
-        occupancy = building.get('occupancy_percent', 100)
-        if occupancy < 60:
-            recs.append(
-                f'With only {occupancy}% occupancy, prioritize vacant floor '
-                'detection to maximize savings'
-            )
-        
-        # Energy grade recommendations
-        grade = building.get('energy_grade', 'N')
-        if grade in self.params['poor_grades']:
-            recs.append(
-                f'Current grade {grade} indicates significant waste - '
-                'ODCV can help achieve grade C or better'
-            )
+        cost = sensor_count * self._sensor_cost
+        result['implementation_plan'] = _implementation_plan(
+            ahu_count, sensor_count, has_bms, weeks, cost,
+            cost / size if size else 0.0
+        )
     
-    def _calculate_financials(self, building: Dict, result: Dict):
+    def _calculate_financials(self, building: Dict, result: Dict) -> None:
         """Calculate financial metrics"""
-        size = building.get('size_sqft', 100000)
+        size = _field(building, 'size_sqft')
         
         # Estimate annual energy cost (very rough)
         # Assume $3.50/sqft for NYC office building
@@ -293,34 +533,189 @@ class ODCVScorer:
         # Implementation cost
         impl_cost = result['implementation_plan']['estimated_cost']
         
-        # Payback
-        if annual_savings > 0:
-            simple_payback = impl_cost / annual_savings
-        else:
-            simple_payback = 999
-        
-        result['financial_analysis'] = {
-            'estimated_annual_hvac_cost': round(annual_hvac_cost),
-            'annual_savings_dollars': round(annual_savings),
-            'implementation_cost': impl_cost,
-            'simple_payback_years': round(simple_payback, 1),
-            'roi_percent': round((annual_savings / impl_cost) * 100, 1) if impl_cost > 0 else 0,
-            'npv_10_year': round(annual_savings * 10 - impl_cost)
-        }
+        result['financial_analysis'] = _financial_analysis(
+            annual_hvac_cost, annual_savings, impl_cost
+        )
         
         result['annual_savings_dollars'] = round(annual_savings)
 
 
-def score_buildings_bulk(buildings: List[Dict]) -> List[Dict]:
-    """Score multiple buildings and rank by opportunity"""
-    scorer = ODCVScorer()
-    results = []
+def score_buildings_bulk(buildings: Union[List[Dict], pa.Table],
+                         year: Optional[int] = None) -> List[Dict]:
+    """
+    Score multiple buildings and rank by opportunity
+    
+    Accepts a list of building dicts or an Arrow table straight from
+    DuckDB; scoring runs column-wise through score_buildings_bulk_vec.
+    """
+    return score_buildings_bulk_vec(buildings, year)
+
+
+def _columns(buildings: Union[List[Dict], pa.Table]) -> Dict[str, list]:
+    """Split buildings into one Python list per scored field (SoA layout)"""
+    if isinstance(buildings, pa.Table):
+        n = buildings.num_rows
+        return {
+            key: (buildings.column(key).to_pylist()
+                  if key in buildings.column_names else [None] * n)
+            for key in SCORED_FIELDS
+        }
+    return {key: [b.get(key) for b in buildings] for key in SCORED_FIELDS}
+
+
+def _filled(values: list, default) -> list:
+    """Replace NULLs with the scalar scorer's default for that field"""
+    return [default if v is None else v for v in values]
+
+
+def score_buildings_bulk_vec(buildings: Union[List[Dict], pa.Table],
+                             year: Optional[int] = None) -> List[Dict]:
+    """
+    Vectorized equivalent of scoring each building with score_building
     
-    for building in buildings:
-        score = scorer.score_building(building)
-        results.append(score)
+    Points, savings and financials are computed over whole columns by the
+    scoring kernel; per-building result dicts (same schema and values as
+    score_building) are only materialized at the end, ranked by score.
+    """
+    params = config.ODCV_PARAMS
+    cols = _columns(buildings)
+    n = len(cols['bbl'])
+    if n == 0:
+        return []
     
-    # Sort by total score descending
-    results.sort(key=lambda x: x['total_score'], reverse=True)
+    # The size check treats a missing size as too small, unlike sizing
+    size_known = _filled(cols['size_sqft'], 0)
+    for key, default in FIELD_DEFAULTS.items():
+        cols[key] = _filled(cols[key], default)
+    
+    # Raw values (defaults applied) are kept for formatting flag text
+    occupancy = cols['occupancy_percent']
+    grade = cols['energy_grade']
+    eui = cols['site_eui']
+    meters = cols['active_meters']
+    
+    has_vav = np.fromiter((bool(v) for v in cols['has_vav']), dtype=bool, count=n)
+    has_bms = np.fromiter((bool(v) for v in cols['has_bms']), dtype=bool, count=n)
+    has_dcv = np.fromiter((bool(v) for v in cols['has_dcv']), dtype=bool, count=n)
+    corporate = np.fromiter((v == 'C' for v in cols['owner_type']), dtype=bool, count=n)
+    floors = np.asarray(cols['floors'])
+    size = np.asarray(cols['size_sqft'])
+    
+    (points, total, savings_pct, ahu_count, sensor_count, weeks, impl_cost,
+     annual_hvac, annual_savings) = score_columns(
+        np.asarray(occupancy, dtype=np.float64),
+        np.asarray(eui, dtype=np.float64),
+        (year or datetime.now().year) - np.asarray(cols['year_built']),
+        encode_grades(grade, n),
+        has_bms, has_dcv, has_vav, corporate,
+        np.asarray(meters, dtype=np.float64),
+        floors, size,
+        grade_mask(params['poor_grades']),
+        int(GRADE_CODES.get(params['medium_grade'], UNKNOWN_GRADE)),
+        params['high_eui_threshold'],
+        params['ahu_per_floors'],
+        params['sensor_cost'],
+        params['integration_weeks_with_bms'],
+        params['integration_weeks_without_bms']
+    )
+    # A zero floor area has no per-square-foot cost, as in score_building
+    cost_per_sqft = np.divide(impl_cost, size, out=np.zeros(n), where=size != 0)
+    
+    flag_bits = (
+        np.where(points[:, 0] == 20, FlagCode.LOW_OCCUPANCY, 0)
+        | np.where(points[:, 0] == 12, FlagCode.GOOD_OCCUPANCY, 0)
+        | np.where(points[:, 1] == 15, FlagCode.POOR_GRADE, 0)
+        | np.where(points[:, 2] == 10, FlagCode.HIGH_EUI, 0)
+        | np.where(has_bms, FlagCode.BMS_PRESENT, FlagCode.NO_BMS)
+        | np.where(has_dcv, FlagCode.HAS_DCV, FlagCode.NO_DCV)
+        | np.where(corporate, FlagCode.CORP_OWNER, 0)
+        | np.where(points[:, 7] > 0, FlagCode.GOOD_MV, 0)
+        | np.where(np.asarray(size_known) < params['min_building_size'],
+                   FlagCode.BELOW_MIN_SIZE, 0)
+    )
+    flag_bits = np.where(has_vav, flag_bits, FlagCode.INCOMPATIBLE)
+    
+    order = np.argsort(-total, kind='stable').tolist()
+    level = np.digitize(total, _LEVEL_THRESHOLDS)
+    levels = np.take(_LEVELS, level).tolist()
+    actions = np.take(_ACTIONS, level).tolist()
+    
+    # Materialize results in ranked order; back to Python scalars first so
+    # the per-building loop does no NumPy element access
+    occ_pts, grade_pts, eui_pts, age_pts, bms_pts, dcv_pts, owner_pts, mv_pts = (
+        points.T.tolist()
+    )
+    (has_vav, has_bms, total, savings_pct, ahu_count, sensor_count, weeks,
+     impl_cost, cost_per_sqft, annual_hvac, annual_savings, flag_bits) = (
+        column.tolist() for column in (
+            has_vav, has_bms, total, savings_pct, ahu_count, sensor_count,
+            weeks, impl_cost, cost_per_sqft, annual_hvac, annual_savings,
+            flag_bits
+        )
+    )
+    min_size = params['min_building_size']
+    
+    results = []
+    for i in order:
+        if not has_vav[i]:
+            results.append(_incompatible_result(cols['bbl'][i], cols['address'][i]))
+            continue
+        
+        result = {
+            'bbl': cols['bbl'][i],
+            'address': cols['address'][i],
+            'total_score': 0,
+            'score_components': {},
+            'savings_potential_percent': 0,
+            'annual_savings_dollars': 0,
+            'deployment_complexity': 'Unknown',
+            'implementation_plan': {},
+            'recommendations': [],
+            'flags': [],
+            'flag_bits': FlagCode(flag_bits[i])
+        }
+        results.append(result)
+        
+        score = total[i]
+        bits = result['flag_bits']
+        flags = result['flags']
+        flags += _compat_verdict(True, size_known[i] < min_size)[1]
+        flags += _flag_text(bits, occupancy[i], grade[i], eui[i], meters[i])
+        
+        savings = {'occupancy': occ_pts[i], 'energy_grade': grade_pts[i]}
+        if eui_pts[i]:
+            savings['eui'] = eui_pts[i]
+        if age_pts[i]:
+            savings['building_age'] = age_pts[i]
+        deployment = {
+            'bms': bms_pts[i],
+            'existing_dcv': dcv_pts[i],
+            'owner_type': owner_pts[i]
+        }
+        if mv_pts[i]:
+            deployment['metering'] = mv_pts[i]
+        
+        result['total_score'] = score
+        result['score_components'] = {
+            'savings_potential': savings,
+            'deployment_ease': deployment
+        }
+        result['savings_potential_percent'] = savings_pct[i]
+        result['deployment_complexity'] = 'LOW' if has_bms[i] else 'MEDIUM'
+        
+        cost = impl_cost[i]
+        result['implementation_plan'] = _implementation_plan(
+            ahu_count[i], sensor_count[i], has_bms[i], weeks[i], cost,
+            cost_per_sqft[i]
+        )
+        result['recommendations'] = _recommendations(
+            bits, score, occupancy[i], grade[i]
+        )
+        
+        saved = annual_savings[i]
+        result['financial_analysis'] = _financial_analysis(annual_hvac[i], saved, cost)
+        result['annual_savings_dollars'] = round(saved)
+        result['opportunity_level'] = levels[i]
+        result['action'] = actions[i]
     
     return results
@@ -2,51 +2,31 @@
 ODCV Sales Report Generator
 Generates professional reports for building assessments
 """
-import json
+import io
 from datetime import datetime
 from typing import Dict, List
 import logging
+import numpy as np
+from odcv_scorer import FlagCode
 
 logger = logging.getLogger(__name__)
 
 
-class ReportGenerator:
-    """Generate sales-ready reports for ODCV opportunities"""
-    
-    def generate_executive_summary(self, assessment: Dict) -> str:
-        """Generate executive summary for C-suite"""
-        
-        # Extract key metrics
-        score = assessment['total_score']
-        savings = assessment['annual_savings_dollars']
-        payback = assessment['financial_analysis']['simple_payback_years']
-        level = assessment['opportunity_level']
-        
-        # Generate appropriate messaging based on opportunity level
-        if level == 'HIGH':
-            urgency = "immediate action recommended"
-            value_prop = "exceptional ROI with minimal disruption"
-        elif level == 'MEDIUM-HIGH':
-            urgency = "strong candidate for Q1 implementation"
-            value_prop = "proven technology with rapid payback"
-        else:
-            urgency = "consider as part of broader efficiency program"
-            value_prop = "incremental improvements available"
-        
-        summary = f"""
+# Report templates, filled from _flatten(assessment) plus per-report extras
+_EXEC_TEMPLATE = """
 EXECUTIVE SUMMARY
 ================
 
-Building: {assessment['address']}
+Building: {address}
 Opportunity Score: {score}/100 ({level})
 
 FINANCIAL IMPACT
 • Annual Savings: ${savings:,}
 • Simple Payback: {payback} years
-• 10-Year NPV: ${assessment['financial_analysis']['npv_10_year']:,}
+• 10-Year NPV: ${npv_10_year:,}
 
 KEY FINDINGS
-{self._generate_key_findings(assessment)}
+{key_findings}
 
 RECOMMENDATION
 Based on our analysis, {urgency}. This building presents {value_prop}.
@@ -54,143 +34,88 @@ Based on our analysis, {urgency}. This building presents {value_prop}.
 NEXT STEPS
 1. Schedule technical assessment (2 hours)
 2. Review implementation plan with facilities team
-3. Execute deployment ({assessment['implementation_plan']['deployment_weeks']} weeks)
+3. Execute deployment ({deployment_weeks} weeks)
 """
-        return summary
-    
-    def generate_technical_report(self, assessment: Dict) -> str:
-        """Generate detailed technical report for facilities team"""
-        
-        impl = assessment['implementation_plan']
-        
-        report = f"""
+
+_TECH_TEMPLATE = """
 TECHNICAL ASSESSMENT REPORT
 ==========================
 
-Building: {assessment['address']}
-Date: {datetime.now().strftime('%B %d, %Y')}
+Building: {address}
+Date: {date}
 
 SYSTEM COMPATIBILITY
 -------------------
 • HVAC Type: Variable Air Volume (VAV) ✓
-• Building Automation: {'Yes - BACnet ready' if impl.get('integration_type', '').startswith('BACnet') else 'Standalone system required'}
-• Current DCV: {'Upgrade from CO2-based' if 'CO2' in str(assessment.get('flags', [])) else 'New installation'}
+• Building Automation: {automation}
+• Current DCV: {current_dcv}
 
 DEPLOYMENT STRATEGY
 ------------------
-• Control Points: {impl['control_points']}
-• Sensor Locations: {impl['sensor_locations']}
-• Integration Method: {impl['integration_type']}
-• Tenant Disruption: {impl['tenant_disruption']}
+• Control Points: {control_points}
+• Sensor Locations: {sensor_locations}
+• Integration Method: {integration_type}
+• Tenant Disruption: {tenant_disruption}
 
 IMPLEMENTATION DETAILS
 ---------------------
-• Sensor Count: {impl['sensor_count']} units
-• AHU Count: {impl['ahu_count']} air handlers
-• Deployment Timeline: {impl['deployment_weeks']} weeks
-• Estimated Cost: ${impl['estimated_cost']:,}
-• Cost per Sq Ft: ${impl['cost_per_sqft']:.2f}
+• Sensor Count: {sensor_count} units
+• AHU Count: {ahu_count} air handlers
+• Deployment Timeline: {deployment_weeks} weeks
+• Estimated Cost: ${estimated_cost:,}
+• Cost per Sq Ft: ${cost_per_sqft:.2f}
 
 ENERGY SAVINGS ANALYSIS
 ----------------------
-• Current HVAC Cost: ${assessment['financial_analysis']['estimated_annual_hvac_cost']:,}
-• Projected Savings: {assessment['savings_potential_percent']}% reduction
-• Annual Dollar Savings: ${assessment['annual_savings_dollars']:,}
+• Current HVAC Cost: ${annual_hvac_cost:,}
+• Projected Savings: {savings_percent}% reduction
+• Annual Dollar Savings: ${savings:,}
 
 SYSTEM ARCHITECTURE
 ------------------
 The ODCV system will control outdoor air (OA) dampers at the AHU level, 
 not individual VAV boxes. This approach:
-- Minimizes complexity (control {impl['ahu_count']} points vs hundreds of VAV boxes)
+- Minimizes complexity (control {ahu_count} points vs hundreds of VAV boxes)
 - Eliminates tenant disruption (all work in mechanical rooms)
-- Enables rapid deployment ({impl['deployment_weeks']} weeks vs months)
-- Provides centralized control via {'existing BMS' if 'BACnet' in impl['integration_type'] else 'cloud platform'}
+- Enables rapid deployment ({deployment_weeks} weeks vs months)
+- Provides centralized control via {control_platform}
 
 MEASUREMENT & VERIFICATION
 -------------------------
-{self._generate_mv_section(assessment)}
+{mv_section}
 """
-        return report
-    
-    def generate_comparison_report(self, buildings: List[Dict]) -> str:
-        """Generate portfolio comparison report"""
-        
-        # Sort by score
-        buildings.sort(key=lambda x: x['total_score'], reverse=True)
-        
-        report = f"""
-PORTFOLIO ODCV OPPORTUNITY ANALYSIS
-==================================
 
-Date: {datetime.now().strftime('%B %d, %Y')}
-Buildings Analyzed: {len(buildings)}
-
-TOP OPPORTUNITIES
-----------------
-"""
-        
-        for i, building in enumerate(buildings[:10], 1):
-            report += f"""
-{i}. {building['address']}
-   Score: {building['total_score']}/100 | Savings: ${building['annual_savings_dollars']:,}/year | Payback: {building['financial_analysis']['simple_payback_years']} years
-   Key Factor: {building.get('flags', [''])[0] if building.get('flags') else 'High potential'}
-"""
-        
-        # Summary statistics
-        total_savings = sum(b['annual_savings_dollars'] for b in buildings)
-        avg_payback = sum(b['financial_analysis']['simple_payback_years'] for b in buildings) / len(buildings)
-        
-        report += f"""
-
-PORTFOLIO SUMMARY
-----------------
-• Total Annual Savings Potential: ${total_savings:,}
-• Average Payback Period: {avg_payback:.1f} years
-• High-Priority Buildings (Score >80): {sum(1 for b in buildings if b['total_score'] > 80)}
-• Quick Wins (Payback <3 years): {sum(1 for b in buildings if b['financial_analysis']['simple_payback_years'] < 3)}
-
-RECOMMENDED IMPLEMENTATION SEQUENCE
-----------------------------------
-Phase 1 (Immediate): Buildings with score >80 and BMS present
-Phase 2 (Q2): Buildings with score >60 and occupancy <70%
-Phase 3 (Q3-Q4): Remaining VAV buildings with proven savings potential
-"""
-        return report
-    
-    def generate_proposal_outline(self, assessment: Dict) -> str:
-        """Generate proposal outline for sales team"""
-        
-        outline = f"""
+_PROPOSAL_TEMPLATE = """
 ODCV PROPOSAL OUTLINE
 ====================
 
-Building: {assessment['address']}
+Building: {address}
 
 1. EXECUTIVE SUMMARY
-   - ${assessment['annual_savings_dollars']:,} annual savings
-   - {assessment['financial_analysis']['simple_payback_years']} year payback
+   - ${savings:,} annual savings
+   - {payback} year payback
    - Zero tenant disruption
 
 2. CURRENT SITUATION
-   - Building operates at {assessment.get('occupancy_percent', 'N/A')}% occupancy
-   - Energy grade: {assessment.get('energy_grade', 'N/A')}
+   - Building operates at {occupancy_percent}% occupancy
+   - Energy grade: {energy_grade}
    - Ventilating vacant spaces at full capacity
 
 3. PROPOSED SOLUTION
    - Occupancy-based control at AHU level
-   - {assessment['implementation_plan']['sensor_count']} sensors total
-   - {assessment['implementation_plan']['integration_type']}
+   - {sensor_count} sensors total
+   - {integration_type}
 
 4. FINANCIAL ANALYSIS
-   - Implementation cost: ${assessment['implementation_plan']['estimated_cost']:,}
-   - Annual savings: ${assessment['annual_savings_dollars']:,}
-   - ROI: {assessment['financial_analysis']['roi_percent']}%
-   - 10-year NPV: ${assessment['financial_analysis']['npv_10_year']:,}
+   - Implementation cost: ${estimated_cost:,}
+   - Annual savings: ${savings:,}
+   - ROI: {roi_percent}%
+   - 10-year NPV: ${npv_10_year:,}
 
 5. IMPLEMENTATION PLAN
    - Week 1-2: Engineering and permits
-   - Week 3-{assessment['implementation_plan']['deployment_weeks']}: Installation
-   - Week {assessment['implementation_plan']['deployment_weeks']+1}: Commissioning
+   - Week 3-{deployment_weeks}: Installation
+   - Week {commissioning_week}: Commissioning
    - Ongoing: Performance monitoring
 
 6. RISK MITIGATION
@@ -208,24 +133,187 @@ Building: {assessment['address']}
    - Final proposal with fixed pricing
    - Implementation timeline confirmation
 """
-        return outline
+
+_COMPARISON_HEADER = """
+PORTFOLIO ODCV OPPORTUNITY ANALYSIS
+==================================
+
+Date: {date}
+Buildings Analyzed: {count}
+
+TOP OPPORTUNITIES
+----------------
+"""
+
+# One comparison row, after its "\n<rank>. " prefix
+_ROW_TEMPLATE = """{address}
+   Score: {total_score}/100 | Savings: ${annual_savings_dollars:,}/year | Payback: {simple_payback_years} years
+   Key Factor: {key_factor}
+"""
+
+_COMPARISON_SUMMARY = """
+
+PORTFOLIO SUMMARY
+----------------
+• Total Annual Savings Potential: ${total_savings:,}
+• Average Payback Period: {avg_payback:.1f} years
+• High-Priority Buildings (Score >80): {high_priority}
+• Quick Wins (Payback <3 years): {quick_wins}
+
+RECOMMENDED IMPLEMENTATION SEQUENCE
+----------------------------------
+Phase 1 (Immediate): Buildings with score >80 and BMS present
+Phase 2 (Q2): Buildings with score >60 and occupancy <70%
+Phase 3 (Q3-Q4): Remaining VAV buildings with proven savings potential
+"""
+
+# Executive summary messaging by opportunity level: (urgency, value_prop)
+_LEVEL_MESSAGING = {
+    'HIGH': ("immediate action recommended",
+             "exceptional ROI with minimal disruption"),
+    'MEDIUM-HIGH': ("strong candidate for Q1 implementation",
+                    "proven technology with rapid payback"),
+}
+_DEFAULT_MESSAGING = ("consider as part of broader efficiency program",
+                      "incremental improvements available")
+
+
+def _flatten(assessment: Dict) -> Dict:
+    """One flat view of the assessment fields the report templates use"""
+    impl = assessment['implementation_plan']
+    financials = assessment['financial_analysis']
+    level = assessment.get('opportunity_level')
+    urgency, value_prop = _LEVEL_MESSAGING.get(level, _DEFAULT_MESSAGING)
+    
+    return {
+        'address': assessment['address'],
+        'score': assessment['total_score'],
+        'level': level,
+        'urgency': urgency,
+        'value_prop': value_prop,
+        'savings': assessment['annual_savings_dollars'],
+        'savings_percent': assessment['savings_potential_percent'],
+        'payback': financials['simple_payback_years'],
+        'npv_10_year': financials['npv_10_year'],
+        'roi_percent': financials['roi_percent'],
+        'annual_hvac_cost': financials['estimated_annual_hvac_cost'],
+        'ahu_count': impl['ahu_count'],
+        'sensor_count': impl['sensor_count'],
+        'sensor_locations': impl['sensor_locations'],
+        'integration_type': impl['integration_type'],
+        'tenant_disruption': impl['tenant_disruption'],
+        'control_points': impl['control_points'],
+        'deployment_weeks': impl['deployment_weeks'],
+        'estimated_cost': impl['estimated_cost'],
+        'cost_per_sqft': impl['cost_per_sqft'],
+        'occupancy_percent': assessment.get('occupancy_percent', 'N/A'),
+        'energy_grade': assessment.get('energy_grade', 'N/A'),
+    }
+
+
+def _flag_bits(assessment: Dict) -> FlagCode:
+    """Flag codes set by the scorer, recovered from the text for older results"""
+    bits = assessment.get('flag_bits')
+    if bits is None:
+        return FlagCode.from_flags(assessment.get('flags', []))
+    return FlagCode(bits)
+
+
+def _comparison_row(building: Dict) -> str:
+    """Format a building's comparison row, without its rank prefix"""
+    return _ROW_TEMPLATE.format(
+        address=building['address'],
+        total_score=building['total_score'],
+        annual_savings_dollars=building['annual_savings_dollars'],
+        simple_payback_years=building['financial_analysis']['simple_payback_years'],
+        key_factor=(building['flags'][0] if building.get('flags')
+                    else 'High potential')
+    )
+
+
+class ReportGenerator:
+    """Generate sales-ready reports for ODCV opportunities"""
+    
+    def generate_executive_summary(self, assessment: Dict) -> str:
+        """Generate executive summary for C-suite"""
+        flat = _flatten(assessment)
+        flat['key_findings'] = self._generate_key_findings(assessment)
+        return _EXEC_TEMPLATE.format_map(flat)
+    
+    def generate_technical_report(self, assessment: Dict) -> str:
+        """Generate detailed technical report for facilities team"""
+        flat = _flatten(assessment)
+        integration = flat['integration_type']
+        
+        flat['date'] = datetime.now().strftime('%B %d, %Y')
+        flat['automation'] = ('Yes - BACnet ready' if integration.startswith('BACnet')
+                              else 'Standalone system required')
+        flat['current_dcv'] = ('Upgrade from CO2-based'
+                               if _flag_bits(assessment) & FlagCode.HAS_DCV
+                               else 'New installation')
+        flat['control_platform'] = 'existing BMS' if 'BACnet' in integration else 'cloud platform'
+        flat['mv_section'] = self._generate_mv_section(assessment)
+        return _TECH_TEMPLATE.format_map(flat)
+    
+    def generate_comparison_report(self, buildings: List[Dict]) -> str:
+        """Generate portfolio comparison report"""
+        if not buildings:
+            raise ValueError("Comparison report needs at least one building")
+        
+        # Sort by score (in place, highest first, ties keep their order)
+        scores = np.fromiter((b['total_score'] for b in buildings),
+                             dtype=float, count=len(buildings))
+        buildings[:] = [buildings[i] for i in np.argsort(-scores, kind='stable').tolist()]
+        
+        buf = io.StringIO()
+        buf.write(_COMPARISON_HEADER.format(
+            date=datetime.now().strftime('%B %d, %Y'), count=len(buildings)
+        ))
+        
+        for i, building in enumerate(buildings[:10], 1):
+            buf.write(f"\n{i}. ")
+            buf.write(_comparison_row(building))
+        
+        # Summary statistics
+        n = len(buildings)
+        savings = np.fromiter((b['annual_savings_dollars'] for b in buildings),
+                              dtype=float, count=n)
+        paybacks = np.fromiter(
+            (b['financial_analysis']['simple_payback_years'] for b in buildings),
+            dtype=float, count=n
+        )
+        
+        # Whole-dollar totals print as integers; fractional savings are kept
+        total_savings = savings.sum()
+        
+        buf.write(_COMPARISON_SUMMARY.format(
+            total_savings=(int(total_savings) if total_savings.is_integer()
+                           else float(total_savings)),
+            avg_payback=paybacks.mean(),
+            high_priority=int(np.count_nonzero(scores > 80)),
+            quick_wins=int(np.count_nonzero(paybacks < 3))
+        ))
+        return buf.getvalue()
+    
+    def generate_proposal_outline(self, assessment: Dict) -> str:
+        """Generate proposal outline for sales team"""
+        flat = _flatten(assessment)
+        flat['commissioning_week'] = flat['deployment_weeks'] + 1
+        return _PROPOSAL_TEMPLATE.format_map(flat)
     
     def _generate_key_findings(self, assessment: Dict) -> str:
         """Generate key findings bullets"""
+        flags = _flag_bits(assessment)
         findings = []
         
-        # Check occupancy
-        if 'occupancy' in str(assessment.get('flags', [])):
-            findings.append("• Building operates at low occupancy, wasting energy on vacant spaces")
-        
         # Check energy grade
         if assessment.get('energy_grade') in ['D', 'F']:
             findings.append(f"• Energy grade {assessment.get('energy_grade')} indicates significant inefficiency")
         
         # Check existing systems
-        if 'BMS present' in str(assessment.get('flags', [])):
+        if flags & FlagCode.BMS_PRESENT:
             findings.append("• Existing BMS enables seamless integration")
-        elif 'No BMS' in str(assessment.get('flags', [])):
+        elif flags & FlagCode.NO_BMS:
             findings.append("• Standalone ODCV system recommended")
         
         # Add savings potential
@@ -235,7 +323,6 @@ Building: {assessment['address']}
     
     def _generate_mv_section(self, assessment: Dict) -> str:
         """Generate measurement and verification section"""
-        
         mv_text = """
 The building's energy savings will be measured through:
 • Direct monitoring of outdoor air flow rates
@@ -251,12 +338,14 @@ The building's energy savings will be measured through:
         return mv_text
 
 
+# ReportGenerator holds no state, so one instance serves every call
+_REPORT_GEN = ReportGenerator()
+
+
 def generate_all_reports(assessment: Dict) -> Dict[str, str]:
     """Generate all report types for a building assessment"""
-    generator = ReportGenerator()
-    
     return {
-        'executive_summary': generator.generate_executive_summary(assessment),
-        'technical_report': generator.generate_technical_report(assessment),
-        'proposal_outline': generator.generate_proposal_outline(assessment)
+        'executive_summary': _REPORT_GEN.generate_executive_summary(assessment),
+        'technical_report': _REPORT_GEN.generate_technical_report(assessment),
+        'proposal_outline': _REPORT_GEN.generate_proposal_outline(assessment)
     }
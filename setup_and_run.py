@@ -9,9 +9,9 @@ from pathlib import Path
 
 
 def check_python_version():
-    """Ensure Python 3.8+"""
-    if sys.version_info < (3, 8):
-        print("❌ Python 3.8 or higher is required")
+    """Ensure Python 3.10+"""
+    if sys.version_info < (3, 10):
+        print("❌ Python 3.10 or higher is required")
         sys.exit(1)
     print("✅ Python version OK")
 
@@ -61,9 +61,14 @@ def check_data_files():
         "LL33 Energy Grades": "data/ll33_grades.csv"
     }
     
+    # List each data directory once and check names against the listing
+    listings = {}
     missing = []
     for name, path in required_files.items():
-        if not Path(path).exists():
+        parent = os.path.dirname(path)
+        if parent not in listings:
+            listings[parent] = set(os.listdir(parent)) if os.path.isdir(parent) else set()
+        if os.path.basename(path) not in listings[parent]:
             missing.append((name, path))
     
     if missing: